@@ -145,14 +145,21 @@ print(f"Merged duplicate unique_id rows: {n_before} -> {len(df)} rows")
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Save cleaned CSV locally
+# MAGIC ## Save cleaned data locally (Parquet + CSV export)
 
 # COMMAND ----------
 
-# This creates the physical file that Agent 1, 2, 3, and 4 will look for
+from columnar_io import write_parquet, export_csv
+
+# This creates the physical file that Agent 1, 2, 3, and 4 will look for.
+# Parquet keeps list columns as real nested lists; the CSV is kept as an export.
+parquet_output_path = "/Workspace/hackathon/clean_virt.parquet"
+write_parquet(df, parquet_output_path)
+print(f"Parquet saved successfully for LLM agents at: {parquet_output_path}")
+
 csv_output_path = "/Workspace/hackathon/clean_virt.csv"
-df.to_csv(csv_output_path, index=False)
-print(f"CSV saved successfully for LLM agents at: {csv_output_path}")
+export_csv(df, csv_output_path)
+print(f"CSV export saved at: {csv_output_path}")
 
 # --- Write cleaned data to a NEW table in the catalogue (original is not touched) ---
 # Same schema (e.g. workspace.default) as the source, new table name
@@ -412,6 +419,10 @@ print("\n--- CHECK COMPLETE ---")
 
 # MAGIC %md
 # MAGIC ## reload all files to ensure new version is the one used
+# MAGIC
+# MAGIC Outside the notebook, `cleaning_data/cli.py` runs the same pipeline without this reload loop:
+# MAGIC `python cli.py --input clean_virt.parquet --output hospitals_translated_full.parquet --concurrency 8`
+# MAGIC (add `--dry-run` to get call counts, estimated tokens and projected wall time without sending anything).
 
 # COMMAND ----------
 
@@ -429,6 +440,10 @@ modules_to_load = [
     'agent_2_cleaner_formatter', 
     'agent_3_capability_scope', 
     'agent_4_reliability',
+    'columnar_io',
+    'dedup',
+    'scheduler',
+    'dead_letter',
     'orchestrator' # Load last so it sees the new agents
 ]
 
@@ -468,6 +483,7 @@ import pandas as pd
 import os
 import time
 from orchestrator import run_pipeline
+from columnar_io import read_artifact, write_parquet, export_csv
 
 # 1. 🔑 Setup Environment
 try:
@@ -479,11 +495,12 @@ except:
     print("⚠️ Note: Ensure DATABRICKS_HOST and DATABRICKS_TOKEN are set in your environment variables.")
 
 # 2. 📥 Load the FULL Dataset
-input_filename = 'clean_virt.csv'
-output_filename = 'hospitals_translated_full.csv'
+input_filename = 'clean_virt.parquet' if os.path.exists('clean_virt.parquet') else 'clean_virt.csv'
+output_filename = 'hospitals_translated_full.parquet'
+csv_export_filename = 'hospitals_translated_full.csv'
 
 print(f"📖 Loading full dataset from: {input_filename}")
-df_full = pd.read_csv(input_filename)
+df_full = read_artifact(input_filename)
 total_rows = len(df_full)
 
 print(f"🚀 Starting transformation of {total_rows} rows...")
@@ -496,15 +513,16 @@ try:
     # Pass the ENTIRE dataframe to the pipeline
     df_result = run_pipeline(df_full)
     
-    # 4. 💾 Save to CSV
-    df_result.to_csv(output_filename, index=False)
+    # 4. 💾 Save to Parquet (nested columns) + CSV export
+    write_parquet(df_result, output_filename)
+    export_csv(df_result, csv_export_filename)
     
     end_time = time.time()
     duration_min = (end_time - start_time) / 60
     
     print(f"\n✅ SUCCESS! Transformation Complete.")
     print(f"⏱️ Time taken: {duration_min:.2f} minutes")
-    print(f"📂 Saved {len(df_result)} rows to: {output_filename}")
+    print(f"📂 Saved {len(df_result)} rows to: {output_filename} (CSV export: {csv_export_filename})")
 
 except Exception as e:
     print(f"\n❌ CRITICAL ERROR: {e}")
@@ -1,5 +1,32 @@
 import json
-from llm_client import call_llm, parse_json_safe
+from llm_client import call_llm_routed, error_info, incomplete_info
+
+OUTPUT_SCHEMA = {
+    "title": "organization_location",
+    "description": "Structured organization and location info for one facility.",
+    "type": "object",
+    "properties": {
+        "organization_info": {
+            "type": "object",
+            "properties": {
+                "organization_type": {"type": ["string", "null"]},
+                "facility_type": {"type": ["string", "null"]},
+                "operator_type": {"type": ["string", "null"]},
+                "year_established": {"type": ["integer", "string", "null"]},
+            },
+        },
+        "location_info": {
+            "type": "object",
+            "properties": {
+                "address_line1": {"type": ["string", "null"]},
+                "address_city": {"type": ["string", "null"]},
+                "address_stateOrRegion": {"type": ["string", "null"]},
+                "address_country": {"type": ["string", "null"]},
+            },
+        },
+    },
+    "required": ["organization_info", "location_info"],
+}
 
 def process(canonical):
     # 1. Initialize Skeleton with Python (Guarantees data presence)
@@ -25,8 +52,8 @@ def process(canonical):
     """
     
     try:
-        raw = call_llm(prompt, system_prompt="Output ONLY valid JSON.")
-        data = parse_json_safe(raw)
+        data = call_llm_routed(prompt, OUTPUT_SCHEMA, system_prompt="Output ONLY valid JSON.")
+        degraded = incomplete_info(OUTPUT_SCHEMA, data)
         
         # Merge if successful
         if "organization_info" in data:
@@ -42,7 +69,8 @@ def process(canonical):
     except Exception as e:
         # Fallback: Create minimal valid JSON strings
         print(f"Agent 2 Warning: LLM failed ({e}). Using empty defaults.")
+        degraded = error_info(e)
         t["organization_info"] = json.dumps({"organization_type": "facility"})
         t["location_info"] = json.dumps({"address_line1": canonical.get("address_line1")})
 
-    return {"translated": t}
\ No newline at end of file
+    return {"translated": t, "degraded": degraded}
\ No newline at end of file
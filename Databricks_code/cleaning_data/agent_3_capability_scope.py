@@ -1,5 +1,30 @@
 import json
-from llm_client import call_llm, parse_json_safe
+from llm_client import call_llm_routed, error_info, incomplete_info
+
+OUTPUT_SCHEMA = {
+    "title": "capability_scope",
+    "description": "Contact details, medical scope and a patient-facing capability summary.",
+    "type": "object",
+    "properties": {
+        "contact_info": {
+            "type": "object",
+            "properties": {
+                "phone_numbers": {"type": "array", "items": {"type": "string"}},
+                "websites": {"type": "array", "items": {"type": "string"}},
+                "email": {"type": ["string", "null"]},
+            },
+        },
+        "medical_details": {
+            "type": "object",
+            "properties": {
+                "specialties": {"type": "array", "items": {"type": "string"}},
+                "procedures": {"type": "array", "items": {"type": "string"}},
+            },
+        },
+        "client_capability": {"type": "string"},
+    },
+    "required": ["contact_info", "medical_details", "client_capability"],
+}
 
 def process(canonical, translated):
     # 1. Setup Context
@@ -13,8 +38,8 @@ def process(canonical, translated):
     """
     
     try:
-        raw = call_llm(prompt, system_prompt="Output ONLY valid JSON.")
-        data = parse_json_safe(raw)
+        data = call_llm_routed(prompt, OUTPUT_SCHEMA, system_prompt="Output ONLY valid JSON.")
+        degraded = incomplete_info(OUTPUT_SCHEMA, data)
         
         # 2. Update Translated Record
         if "contact_info" in data:
@@ -26,5 +51,6 @@ def process(canonical, translated):
             
     except Exception as e:
         print(f"Agent 3 Warning: LLM enrichment failed ({e}). Keeping defaults.")
+        degraded = error_info(e)
 
-    return {"translated": translated}
\ No newline at end of file
+    return {"translated": translated, "degraded": degraded}
\ No newline at end of file
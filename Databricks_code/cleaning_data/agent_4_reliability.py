@@ -1,6 +1,22 @@
 import json
 from datetime import datetime
-from llm_client import call_llm, parse_json_safe
+from llm_client import call_llm_routed, error_info, incomplete_info
+
+OUTPUT_SCHEMA = {
+    "title": "reliability_audit",
+    "description": "Reliability grade, the reasons behind it and a 0-100 score.",
+    "type": "object",
+    "properties": {
+        "reliability": {"type": "string", "enum": ["High", "Moderate", "Low"]},
+        "reliability_reasons": {"type": "array", "items": {"type": "string"}},
+        "stats": {
+            "type": "object",
+            "properties": {"score": {"type": "number"}},
+            "required": ["score"],
+        },
+    },
+    "required": ["reliability", "reliability_reasons", "stats"],
+}
 
 def process(canonical, translated):
     # 1. LLM Audit
@@ -11,8 +27,8 @@ def process(canonical, translated):
     """
     
     try:
-        raw = call_llm(prompt, system_prompt="Output ONLY valid JSON.")
-        data = parse_json_safe(raw)
+        data = call_llm_routed(prompt, OUTPUT_SCHEMA, system_prompt="Output ONLY valid JSON.")
+        degraded = incomplete_info(OUTPUT_SCHEMA, data)
         
         if "reliability" in data:
             translated["reliability"] = data["reliability"]
@@ -23,6 +39,7 @@ def process(canonical, translated):
             
     except Exception as e:
         print(f"Agent 4 Warning: LLM Audit failed ({e}). Using Heuristic.")
+        degraded = error_info(e)
         
     # 2. FINAL GUARANTEE (The Heuristic Fallback)
     # If reliability is still missing, calculate it based on data presence
@@ -42,4 +59,4 @@ def process(canonical, translated):
 
     translated["created_at"] = datetime.utcnow().isoformat() + "Z"
     
-    return {"translated": translated}
\ No newline at end of file
+    return {"translated": translated, "degraded": degraded}
\ No newline at end of file
@@ -0,0 +1,270 @@
+"""
+Command-line entry point for the enrichment pipeline (replaces the notebook reload loop).
+
+    python cli.py --input clean_virt.parquet --output hospitals_translated_full.parquet
+    python cli.py --input clean_virt.parquet --dry-run --concurrency 8
+    python cli.py --output hospitals_translated_full.parquet --replay --replay-stage agent_3
+
+Heavy modules (pandas, pyarrow, the agents) are imported inside main(), so
+--help starts instantly and --dry-run only pays for what it uses.
+"""
+import argparse
+import os
+import sys
+import time
+
+DEFAULT_LATENCY_S = 5.0  # used for projections when there is no latency history yet
+
+
+def build_parser():
+    p = argparse.ArgumentParser(prog="vericare-pipeline", description="Run the 4-agent enrichment pipeline.")
+    p.add_argument("--input", "-i", default="clean_virt.parquet",
+                   help="Cleaned input (.parquet or .csv). Default: clean_virt.parquet")
+    p.add_argument("--output", "-o", default="hospitals_translated_full.parquet",
+                   help="Enriched output (.parquet or .csv). Default: hospitals_translated_full.parquet")
+    p.add_argument("--csv-export", default=None,
+                   help="Also write a CSV export here (JSON-encoded nested columns).")
+    p.add_argument("--concurrency", "-j", type=int, default=1, help="Rows processed in parallel. Default: 1")
+    p.add_argument("--mode", choices=["overwrite", "resume"], default="overwrite",
+                   help="resume: skip rows whose id is already in --output and append to it.")
+    p.add_argument("--limit", type=int, default=None, help="Only process the first N input rows.")
+    p.add_argument("--no-dedupe", action="store_true", help="Disable near-duplicate clustering.")
+    p.add_argument("--cache-dir", default=os.environ.get("LLM_CACHE_DIR", ".llm_cache"),
+                   help="LLM response cache directory. Default: .llm_cache")
+    p.add_argument("--no-cache", action="store_true", help="Disable the LLM response cache.")
+    p.add_argument("--stats-path", default=os.environ.get("LLM_STATS_PATH", "llm_stats.jsonl"),
+                   help="Per-call latency/token log, used for dry-run projections. Default: llm_stats.jsonl")
+    p.add_argument("--no-routing", action="store_true",
+                   help="Send every call to the large model (disable small-model-first routing).")
+    p.add_argument("--small-model", default=None,
+                   help="Serving endpoint for the first routing tier. Default: DATABRICKS_SMALL_MODEL_NAME "
+                        "or databricks-meta-llama-3-1-8b-instruct")
+    p.add_argument("--priority", default="region,richness",
+                   help="Comma-separated row priorities: region, richness, stale ('' keeps input order). "
+                        "Default: region,richness")
+    p.add_argument("--max-minutes", type=float, default=None,
+                   help="Wall-clock budget; no new row starts after it. Finished rows are merged "
+                        "into --output by id (other rows are kept).")
+    p.add_argument("--max-tokens", type=int, default=None,
+                   help="Token budget (input + output, uncached calls); same stopping rule.")
+    p.add_argument("--dead-letter", default=os.environ.get("DEAD_LETTER_PATH", "dead_letter.jsonl"),
+                   help="Dead-letter store for failed/degraded stages. Default: dead_letter.jsonl")
+    p.add_argument("--replay", action="store_true",
+                   help="Re-run only dead-lettered stages (bypassing the LLM cache) and merge them into "
+                        "--output (no full run).")
+    p.add_argument("--replay-stage", action="append", choices=["agent_1", "agent_2", "agent_3", "agent_4"],
+                   help="With --replay: only these stages (repeatable). Default: all.")
+    p.add_argument("--replay-ids", default=None,
+                   help="With --replay: comma-separated row ids. Default: all affected rows.")
+    p.add_argument("--dry-run", action="store_true",
+                   help="Build every prompt without sending it; report calls, tokens and projected time.")
+    return p
+
+
+def _id_set(series):
+    return {str(v) for v in series if v is not None and v == v}
+
+
+def _done_ids(output):
+    """Ids covered by `output`: its own rows plus the near-duplicates folded into them."""
+    from dedup import folded_ids
+    return _id_set(output["id"]) | folded_ids(output)
+
+
+def _load_input(args, existing=None):
+    from columnar_io import read_artifact
+    df = read_artifact(args.input)
+    if args.limit:
+        df = df.head(args.limit)
+    if args.mode == "resume" and existing is not None and "id" in existing.columns and "pk_unique_id" in df.columns:
+        done = _done_ids(existing)
+        before = len(df)
+        df = df[~df["pk_unique_id"].astype(str).isin(done)]
+        print(f"⏩ Resume: {before - len(df)} rows already in {args.output}, {len(df)} left.")
+    return df
+
+
+def _tier_stats(stats, agent, tier):
+    """Logged stats for (agent, tier), else the tier across agents, else None."""
+    if not stats:
+        return None
+    return stats["by_agent"].get((agent, tier)) or stats["by_tier"].get(tier)
+
+
+def _rates(stats, agent):
+    """
+    Logged escalation rate (large calls per small call) and follow-up rate (follow-ups
+    per large call) for an agent, else across all agents. Without history every
+    small call is assumed to escalate, with no follow-ups.
+    """
+    tiers = ("small", "large", "followup")
+    groups = ({t: stats["by_agent"].get((agent, t)) for t in tiers}, stats["by_tier"]) if stats else ()
+    for group in groups:
+        small, large, followup = ((group.get(t) or {}).get("calls", 0) for t in tiers)
+        if small or large:
+            return (large / small if small else 1.0), (followup / large if large else 0.0)
+    return 1.0, 0.0
+
+
+def _merge_by_id(existing, result):
+    """
+    `existing` with rows sharing an id with `result` replaced by the new records.
+    A row folded into a representative on either side (duplicate_ids) is dropped,
+    so each facility keeps a single row.
+    """
+    import pandas as pd
+    from dedup import folded_ids
+    if existing is None or existing.empty or "id" not in existing.columns:
+        return result
+    if result.empty or "id" not in result.columns:
+        return existing
+    kept = existing[~existing["id"].astype(str).isin(_done_ids(result))]
+    result = result[~result["id"].astype(str).isin(folded_ids(kept))]
+    return pd.concat([kept, result], ignore_index=True)
+
+
+def dry_run_report(calls, stats, concurrency):
+    """
+    Projects a real run from the recorded (unsent) first-tier calls. Routed calls are
+    expanded with the logged escalation and follow-up rates, and every tier is priced
+    with its own logged latency and output size (DEFAULT_LATENCY_S without history).
+    Cache hits cost nothing; their escalations were cached by the same earlier run.
+    """
+    per_agent = {}
+    for c in calls:
+        a = per_agent.setdefault(c["agent"], {"calls": 0, "cached": 0, "input_tokens": 0, "max_output_tokens": 0,
+                                              "tiers": {}})
+        if c.get("cached"):
+            a["cached"] += 1
+            continue
+        tiers = {c["tier"] or "large": 1.0}
+        if c["tier"]:
+            esc, fu = _rates(stats, c["agent"])
+            large = esc if c["tier"] == "small" else 1.0
+            tiers.update({"large": large, "followup": large * fu})
+        for tier, n in tiers.items():
+            if n:
+                a["tiers"][tier] = a["tiers"].get(tier, 0) + n
+                a["calls"] += n
+                # Escalations and follow-ups resend the prompt with a narrower schema: an upper bound
+                a["input_tokens"] += n * c["input_tokens"]
+                a["max_output_tokens"] += n * c["max_tokens"]
+
+    wall = wall_p90 = 0.0
+    output_tokens, known_output = 0.0, bool(stats)
+    for agent, a in per_agent.items():
+        for tier, n in a["tiers"].items():
+            st = _tier_stats(stats, agent, tier)
+            wall += n * (st["mean_latency_s"] if st else DEFAULT_LATENCY_S)
+            wall_p90 += n * (st["p90_latency_s"] if st else DEFAULT_LATENCY_S)
+            if st:
+                output_tokens += n * st["mean_output_tokens"]
+            else:
+                known_output = False
+
+    total_calls = sum(a["calls"] for a in per_agent.values())
+    report = {
+        "per_agent": per_agent,
+        "calls": round(total_calls),
+        "recorded_calls": len(calls),
+        "cached_calls": sum(a["cached"] for a in per_agent.values()),
+        "input_tokens": round(sum(a["input_tokens"] for a in per_agent.values())),
+        "output_tokens": round(output_tokens) if known_output else None,
+        "latency_source": f"per agent/tier means of last {stats['calls']} calls" if stats else
+                          f"default {DEFAULT_LATENCY_S:.1f}s per call (no history)",
+        # Calls within a row are sequential; rows run `concurrency` at a time
+        "projected_wall_s": wall / max(1, concurrency),
+    }
+    if stats:
+        report["projected_wall_s_p90"] = wall_p90 / max(1, concurrency)
+    return report
+
+
+def print_report(report):
+    print("\n--- 🧮 DRY RUN ---")
+    for agent, a in sorted(report["per_agent"].items()):
+        tiers = " ".join(f"{t}={n:.1f}" for t, n in a["tiers"].items())
+        print(f"  {agent:<32} calls≈{a['calls']:<8.1f} input_tokens≈{a['input_tokens']:<9.0f} "
+              f"max_output_tokens={a['max_output_tokens']:.0f} cached={a['cached']} ({tiers})")
+    print(f"  Total calls: ≈{report['calls']} ({report['recorded_calls']} first-tier calls recorded, "
+          f"{report['cached_calls']} answered from the cache)")
+    print(f"  Estimated input tokens: {report['input_tokens']}")
+    out = report["output_tokens"]
+    print(f"  Estimated output tokens: {out if out is not None else 'unknown (no history)'}")
+    print(f"  Latency: {report['latency_source']}")
+    print(f"  Projected wall time: {report['projected_wall_s'] / 60:.1f} min"
+          + (f" (p90: {report['projected_wall_s_p90'] / 60:.1f} min)" if "projected_wall_s_p90" in report else ""))
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Lazy imports: only after argument parsing
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import llm_client
+    llm_client.configure(
+        cache_dir=None if args.no_cache else args.cache_dir,
+        stats_path=args.stats_path,
+        dry_run=args.dry_run,
+        routing=not args.no_routing,
+    )
+    if args.small_model:
+        llm_client.configure(small_model=args.small_model)
+    from orchestrator import run_pipeline, replay_dead_letters
+    from dead_letter import DeadLetterStore
+    from columnar_io import read_artifact, write_parquet, export_csv
+    dead_letter = DeadLetterStore(args.dead_letter)
+
+    def save(result):
+        if args.output.endswith(".parquet"):
+            write_parquet(result, args.output)
+        else:
+            export_csv(result, args.output)
+        if args.csv_export:
+            export_csv(result, args.csv_export)
+
+    if args.replay:
+        import pandas as pd
+        existing = read_artifact(args.output) if os.path.exists(args.output) else pd.DataFrame()
+        ids = [i.strip() for i in args.replay_ids.split(",")] if args.replay_ids else None
+        result = replay_dead_letters(existing, dead_letter, stages=args.replay_stage, ids=ids)
+        save(result)
+        left = sum(c["failed"] + c["degraded"] for c in dead_letter.summary().values())
+        print(f"\n✅ Saved {len(result)} rows to {args.output}; {left} dead letters still open.")
+        return 0
+
+    existing = read_artifact(args.output) if os.path.exists(args.output) else None
+    df = _load_input(args, existing)
+    print(f"📖 Loaded {len(df)} rows from {args.input}")
+    priority = tuple(p.strip() for p in args.priority.split(",") if p.strip())
+
+    if args.dry_run:
+        run_pipeline(df, dedupe=not args.no_dedupe, concurrency=1, priority=priority, existing=existing,
+                     dead_letter=False)
+        print_report(dry_run_report(llm_client.DRY_RUN_CALLS, llm_client.recent_call_stats(), args.concurrency))
+        return 0
+
+    from scheduler import Budget
+    budget = None
+    if args.max_minutes is not None or args.max_tokens is not None:
+        budget = Budget(max_seconds=args.max_minutes * 60 if args.max_minutes is not None else None,
+                        max_tokens=args.max_tokens)
+
+    start = time.time()
+    result = run_pipeline(df, dedupe=not args.no_dedupe, concurrency=args.concurrency,
+                          priority=priority, budget=budget, existing=existing, dead_letter=dead_letter)
+
+    # A bounded run only covers part of the input, so it updates the previous output instead of replacing it
+    if args.mode == "resume" or budget is not None:
+        result = _merge_by_id(existing, result)
+
+    save(result)
+
+    print(f"\n✅ Saved {len(result)} rows to {args.output} in {(time.time() - start) / 60:.2f} minutes")
+    if budget is not None and budget.deferred:
+        print(f"⏩ {budget.deferred} rows deferred by the budget; rerun with --mode resume to continue.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Columnar (Parquet/Arrow) storage for pipeline artifacts.
+clean_virt and hospitals_translated_full are stored with real nested columns
+(list<string> / struct) instead of quoted JSON. CSV stays available via export_csv.
+"""
+import json
+import pandas as pd
+
+# Raw list columns (clean_virt)
+LIST_COLUMNS = [
+    "specialties", "procedure", "equipment", "capability",
+    "phone_numbers", "websites", "affiliationTypeIds", "countries",
+    # Enriched list columns (hospitals_translated_full)
+    "reliability_reasons", "capability_reasons",
+    # Near-duplicates folded into a representative row (dedup.attach_members)
+    "duplicate_ids", "duplicate_source_urls"
+]
+
+# Enriched object columns written by Agents 2-4
+STRUCT_COLUMNS = [
+    "organization_info", "location_info", "contact_info", "medical_details", "stats"
+]
+
+
+def is_missing(v):
+    """None, NaN/NA or a blank string."""
+    return v is None or v is pd.NA or (isinstance(v, float) and v != v) or (isinstance(v, str) and not v.strip())
+
+
+def _load_json(v):
+    if v is None or (isinstance(v, float) and v != v):
+        return None
+    if isinstance(v, str):
+        s = v.strip()
+        if s in ("", "null"):
+            return None
+        try:
+            return json.loads(s)
+        except (json.JSONDecodeError, TypeError):
+            return s
+    if hasattr(v, "tolist"):
+        return v.tolist()
+    return v
+
+
+def _as_str(item):
+    if item is None:
+        return None
+    return item if isinstance(item, str) else json.dumps(item, ensure_ascii=False)
+
+
+def _to_list(v):
+    v = _load_json(v)
+    if v is None:
+        return None
+    if not isinstance(v, list):
+        v = [v]
+    return [_as_str(x) for x in v]
+
+
+KEYS_FIELD = "__keys__"                # per-row key list: keeps key order and absent vs null
+JSON_FIELDS_META = b"vericare.json_fields"   # {column: [struct fields stored as JSON text]}
+
+
+def _scalar_type(values):
+    """Arrow type shared by all non-null values, or None if they need the JSON fallback."""
+    import pyarrow as pa
+    kinds = {type(v) for v in values}
+    if not kinds:
+        return pa.string()
+    if kinds == {bool}:
+        return pa.bool_()
+    if kinds == {int}:
+        return pa.int64()
+    if kinds == {float}:
+        return pa.float64()
+    if kinds == {str}:
+        return pa.string()
+    return None
+
+
+def _field_type(values):
+    import pyarrow as pa
+    values = [v for v in values if v is not None]
+    if values and all(isinstance(v, list) for v in values):
+        item = _scalar_type([x for v in values for x in v if x is not None])
+        if item is not None and all(x is not None for v in values for x in v):
+            return pa.list_(item)
+        return None
+    if any(isinstance(v, (list, dict)) for v in values):
+        return None
+    return _scalar_type(values)
+
+
+def _struct_array(series):
+    """
+    Struct column with per-field inferred types. Fields whose values mix types or
+    nest objects are stored as JSON text and listed in the returned json_fields.
+    """
+    import pyarrow as pa
+    values = [_load_json(v) for v in series]
+    values = [v if isinstance(v, dict) else None for v in values]
+    keys = []
+    for d in values:
+        for k in (d or {}):
+            if k not in keys:
+                keys.append(k)
+    if not any(d is not None for d in values):
+        return pa.array([None] * len(values), type=pa.string()), []
+
+    fields, json_fields = [pa.field(KEYS_FIELD, pa.list_(pa.string()))], []
+    for k in keys:
+        typ = _field_type([d.get(k) for d in values if d is not None])
+        if typ is None:
+            json_fields.append(k)
+            typ = pa.string()
+        fields.append(pa.field(k, typ))
+
+    rows = []
+    for d in values:
+        if d is None:
+            rows.append(None)
+            continue
+        row = {KEYS_FIELD: list(d)}
+        for k in keys:
+            x = d.get(k)
+            row[k] = json.dumps(x) if k in json_fields and k in d else x
+        rows.append(row)
+    return pa.array(rows, type=pa.struct(fields)), json_fields
+
+
+def _restore_struct(v, json_fields):
+    """Inverse of _struct_array for one value: original keys, order and types."""
+    if not isinstance(v, dict) or KEYS_FIELD not in v:
+        return v
+    return {k: json.loads(v[k]) if k in json_fields and v.get(k) is not None else v.get(k)
+            for k in v[KEYS_FIELD]}
+
+
+def _object_array(s):
+    """Object columns keep bool/int/float when homogeneous; mixed values are stored as text."""
+    import pyarrow as pa
+    present = [x for x in s if not (x is None or x is pd.NA or (isinstance(x, float) and x != x))]
+    typ = _scalar_type(present)
+    if typ is not None and typ != pa.string():
+        return pa.array([None if x is None or x is pd.NA or (isinstance(x, float) and x != x) else x for x in s],
+                        type=typ)
+    return pa.array([None if x is None or x is pd.NA or (isinstance(x, float) and x != x)
+                     else (x if isinstance(x, str) else str(x)) for x in s], type=pa.string())
+
+
+def to_arrow_table(df: pd.DataFrame):
+    """Converts a pipeline DataFrame (JSON strings or Python objects) into a nested Arrow table."""
+    import pyarrow as pa
+    arrays, names, json_fields = [], [], {}
+    for col in df.columns:
+        if col in LIST_COLUMNS:
+            arr = pa.array([_to_list(v) for v in df[col]], type=pa.list_(pa.string()))
+        elif col in STRUCT_COLUMNS:
+            arr, jf = _struct_array(df[col])
+            if jf:
+                json_fields[str(col)] = jf
+        elif df[col].dtype == object:
+            arr = _object_array(df[col])
+        else:
+            arr = pa.Array.from_pandas(df[col])
+        arrays.append(arr)
+        names.append(str(col))
+    table = pa.Table.from_arrays(arrays, names=names)
+    return table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                          JSON_FIELDS_META: json.dumps(json_fields).encode()})
+
+
+def write_parquet(df: pd.DataFrame, path, row_group_size=256, compression="zstd"):
+    """Writes df to Parquet with nested columns and per-row-group statistics."""
+    import pyarrow.parquet as pq
+    table = to_arrow_table(df)
+    pq.write_table(table, path, row_group_size=row_group_size,
+                   compression=compression, write_statistics=True)
+    return path
+
+
+def read_parquet(path, columns=None, filters=None, memory_map=True) -> pd.DataFrame:
+    """
+    Reads a pipeline artifact. Only `columns` are decoded (projection); `filters`
+    uses row-group statistics to skip row groups, e.g. [("address_city", "==", "Accra")].
+    Nested columns come back as plain Python lists/dicts so the agents can use them directly.
+    """
+    import pyarrow.parquet as pq
+    table = pq.read_table(path, columns=columns, filters=filters, memory_map=memory_map)
+    nested = [c for c in table.column_names if c in LIST_COLUMNS or c in STRUCT_COLUMNS]
+    json_fields = json.loads((table.schema.metadata or {}).get(JSON_FIELDS_META, b"{}"))
+    df = table.drop_columns(nested).to_pandas() if nested else table.to_pandas()
+    for c in nested:
+        values = table.column(c).to_pylist()
+        if c in STRUCT_COLUMNS:
+            values = [_restore_struct(v, json_fields.get(c, [])) for v in values]
+        df[c] = values
+    return df[table.column_names]
+
+
+def open_dataset(path):
+    """Memory-mapped ParquetFile handle for row-group-at-a-time reads (pf.read_row_group(i, columns=...))."""
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path, memory_map=True)
+
+
+def row_group_stats(path) -> pd.DataFrame:
+    """One row per (row_group, column) with num_values, null_count, min and max."""
+    meta = open_dataset(path).metadata
+    out = []
+    for i in range(meta.num_row_groups):
+        rg = meta.row_group(i)
+        for j in range(rg.num_columns):
+            col = rg.column(j)
+            st = col.statistics
+            has_minmax = st is not None and st.has_min_max
+            out.append({
+                "row_group": i,
+                "column": col.path_in_schema,
+                "num_rows": rg.num_rows,
+                "null_count": st.null_count if st is not None and st.has_null_count else None,
+                "min": st.min if has_minmax else None,
+                "max": st.max if has_minmax else None,
+            })
+    return pd.DataFrame(out)
+
+
+def to_json_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Inverse of the nested layout: list/struct values back to JSON strings (CSV-compatible)."""
+    out = df.copy()
+    for col in LIST_COLUMNS + STRUCT_COLUMNS:
+        if col not in out.columns:
+            continue
+        out[col] = out[col].apply(
+            lambda v: v if v is None or isinstance(v, str) or (isinstance(v, float) and v != v)
+            else json.dumps(v.tolist() if hasattr(v, "tolist") else v)
+        )
+    return out
+
+
+def export_csv(df: pd.DataFrame, path):
+    """Writes the legacy CSV export with JSON-encoded nested columns."""
+    to_json_columns(df).to_csv(path, index=False)
+    return path
+
+
+def read_artifact(path, columns=None) -> pd.DataFrame:
+    """Reads either format: Parquet natively, CSV with usecols projection."""
+    if str(path).endswith(".parquet"):
+        return read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
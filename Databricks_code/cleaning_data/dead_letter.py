@@ -0,0 +1,104 @@
+"""
+Persistent dead-letter store for failed or degraded pipeline stages.
+Append-only JSONL: one entry per (row_id, stage); the latest line wins, and a
+resolved tombstone clears an entry after a successful replay.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+STAGES = ("agent_1", "agent_2", "agent_3", "agent_4")
+
+# Output fields each stage is responsible for (what a replay merges back)
+STAGE_FIELDS = {
+    "agent_1": (),
+    "agent_2": ("name", "description", "mission_statement", "organization_description",
+                "organization_info", "location_info"),
+    "agent_3": ("contact_info", "medical_details", "client_capability"),
+    "agent_4": ("reliability", "reliability_reasons", "stats", "created_at"),
+}
+
+DEFAULT_PATH = os.environ.get("DEAD_LETTER_PATH", "dead_letter.jsonl")
+
+
+def _jsonable(o):
+    if hasattr(o, "tolist"):
+        return o.tolist()
+    if hasattr(o, "item"):
+        return o.item()
+    try:
+        if pd.isna(o):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return str(o)
+
+
+class DeadLetterStore:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._open = None  # {(row_id, stage)} of open entries, loaded on first is_open()
+
+    def _append(self, entry):
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry, default=_jsonable) + "\n")
+            if self._open is not None:
+                key = (entry["row_id"], entry["stage"])
+                if entry.get("resolved"):
+                    self._open.discard(key)
+                else:
+                    self._open.add(key)
+
+    def record(self, row_id, stage, inputs, error_class, error, degraded=False, pending=()):
+        """
+        Stores a failed (raised) or degraded (fell back to defaults) stage with the
+        exact inputs it received. `pending` lists downstream stages that never ran.
+        """
+        self._append({
+            "row_id": str(row_id), "stage": stage, "degraded": degraded,
+            "error_class": error_class, "error": str(error)[:500],
+            "pending": list(pending), "inputs": inputs,
+            "recorded_at": datetime.utcnow().isoformat() + "Z",
+        })
+
+    def resolve(self, row_id, stage):
+        self._append({"row_id": str(row_id), "stage": stage, "resolved": True,
+                      "recorded_at": datetime.utcnow().isoformat() + "Z"})
+
+    def is_open(self, row_id, stage):
+        """True if (row_id, stage) has an open entry (read from the file once, then kept in memory)."""
+        if self._open is None:
+            keys = {(e["row_id"], e["stage"]) for e in self.entries()}
+            with self._lock:
+                if self._open is None:
+                    self._open = keys
+        return (str(row_id), stage) in self._open
+
+    def entries(self, stages=None, ids=None):
+        """Open entries (latest per row_id/stage), optionally filtered by stage and row id."""
+        if not os.path.exists(self.path):
+            return []
+        latest = {}
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    e = json.loads(line)
+                    latest[(e["row_id"], e["stage"])] = e
+        ids = {str(i) for i in ids} if ids else None
+        return [e for e in latest.values()
+                if not e.get("resolved")
+                and (not stages or e["stage"] in stages)
+                and (ids is None or e["row_id"] in ids)]
+
+    def summary(self):
+        """{stage: {"failed": n, "degraded": n}} for open entries."""
+        out = {}
+        for e in self.entries():
+            s = out.setdefault(e["stage"], {"failed": 0, "degraded": 0})
+            s["degraded" if e["degraded"] else "failed"] += 1
+        return out
@@ -0,0 +1,308 @@
+"""
+Near-duplicate facility detection (runs before the orchestrator).
+Blocking keys: normalized name (+city), phone, website domain, email.
+Description text: MinHash/LSH candidates, confirmed by estimated Jaccard.
+Each cluster is enriched once (representative), which lists its members.
+"""
+import json
+import re
+import zlib
+import pandas as pd
+
+from columnar_io import LIST_COLUMNS, is_missing
+
+# Profile pages are shared by many facilities, never a dedupe key
+SOCIAL_DOMAINS = ("linkedin.com", "facebook.com", "twitter.com", "x.com", "instagram.com",
+                  "youtube.com", "google.com", "wa.me", "whatsapp.com")
+
+NAME_STOPWORDS = {"the", "of", "and", "ltd", "limited", "ghana", "gh", "co"}
+NAME_ABBREV = {"hosp": "hospital", "hosp.": "hospital", "clin": "clinic", "st": "saint",
+               "med": "medical", "ctr": "centre", "center": "centre", "chps": "chps"}
+# An address needs a real street token: a street word next to a comma, a house/plot number
+# in front of a street word, or a P.O. box. Digits alone ('37 Military Hospital') do not count.
+_STREET = r"(?:rd|road|street|avenue|ave|lane|highway|hwy|crescent|close)\.?"
+ADDRESS_PATTERNS = [
+    re.compile(rf"\b{_STREET}(?=\W|$).*,|,.*\b{_STREET}(?=\W|$)", re.I),
+    re.compile(rf"\b(?:no\.?\s*|plot\s*)?\d+[a-z]?(?:/\S+)?\s+(?:[a-z'.-]+\s+){{0,3}}{_STREET}(?=\W|$)", re.I),
+    re.compile(r"\bp\.?\s?o\.?\s*box\b", re.I),
+]
+
+NUM_PERM = 64
+BANDS = 16                      # 16 bands x 4 rows
+SHINGLE = 3                     # word 3-grams
+JACCARD_THRESHOLD = 0.8         # estimated description similarity
+NAME_JACCARD_THRESHOLD = 0.6    # name-token overlap needed when only one contact key matches
+MAX_BLOCK_SIZE = 4              # larger blocks are shared directory contacts / boilerplate
+_MERSENNE = (1 << 61) - 1
+_PERMS = [((i * 2654435761 + 1) % _MERSENNE, (i * 40503 + 7) % _MERSENNE) for i in range(1, NUM_PERM + 1)]
+
+
+def _as_list(v):
+    if is_missing(v):
+        return []
+    if isinstance(v, list):
+        return v
+    if hasattr(v, "tolist"):
+        return v.tolist()
+    s = str(v).strip()
+    if s.startswith("["):
+        try:
+            out = json.loads(s)
+            return out if isinstance(out, list) else [out]
+        except json.JSONDecodeError:
+            pass
+    return [s]
+
+
+_SEGMENT_SPLIT = re.compile(r"\s[-\u2013]\s|,|\(")
+
+
+def _has_address(text):
+    return any(p.search(text) for p in ADDRESS_PATTERNS)
+
+
+def looks_like_address(name):
+    """
+    True when the `name` column holds an address rather than a name
+    (e.g. '109/No 1 Bekwai Rd ... Takoradi, Ghana'), judged on its leading segment.
+    'Police Clinic, Maxwell Road' is a name followed by an address, not an address.
+    """
+    if is_missing(name):
+        return False
+    lead = _SEGMENT_SPLIT.split(str(name))[0].strip()
+    return _has_address(str(name)) and (not lead or _has_address(lead)
+                                        or re.search(rf"\b{_STREET}$", lead, re.I) is not None)
+
+
+def normalize_name(name):
+    if is_missing(name) or looks_like_address(name):
+        return None
+    name = str(name)
+    if _has_address(name):
+        # 'Marie Stopes Ghana, 26 Akwei Street, ...' -> 'Marie Stopes Ghana'
+        name = _SEGMENT_SPLIT.split(name)[0]
+    tokens = re.sub(r"[^a-z0-9 ]", " ", name.lower()).split()
+    tokens = [NAME_ABBREV.get(t, t) for t in tokens if t not in NAME_STOPWORDS]
+    return " ".join(tokens) or None
+
+
+def normalize_phone(p):
+    digits = re.sub(r"\D", "", str(p))
+    # Compare on the national significant number (+233 24... == 024...)
+    return digits[-9:] if len(digits) >= 9 else None
+
+
+def normalize_domain(url):
+    if is_missing(url):
+        return None
+    d = re.sub(r"^[a-z]+://", "", str(url).strip().lower()).split("/")[0].split("?")[0]
+    d = d[4:] if d.startswith("www.") else d
+    if not d or "." not in d or any(d == s or d.endswith("." + s) for s in SOCIAL_DOMAINS):
+        return None
+    return d
+
+
+def blocking_keys(row):
+    """Exact-match keys; two rows sharing any key are candidate duplicates."""
+    keys = set()
+    name = normalize_name(row.get("name"))
+    if name:
+        city = row.get("address_city")
+        city = None if is_missing(city) else str(city).strip().lower()
+        keys.add(("name", name, city))
+    for p in _as_list(row.get("phone_numbers")):
+        p = normalize_phone(p)
+        if p:
+            keys.add(("phone", p))
+    for w in _as_list(row.get("websites")) + [row.get("officialWebsite")]:
+        d = normalize_domain(w)
+        if d:
+            keys.add(("web", d))
+    email = row.get("email")
+    if not is_missing(email):
+        keys.add(("email", str(email).strip().lower()))
+    return keys
+
+
+def _shingles(text):
+    words = re.sub(r"[^a-z0-9 ]", " ", str(text).lower()).split()
+    if len(words) < SHINGLE:
+        return set()
+    return {" ".join(words[i:i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)}
+
+
+def minhash(shingles):
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    return tuple(min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMS)
+
+
+def _description_text(row):
+    parts = [row.get(c) for c in ("description", "organizationDescription")]
+    return " ".join(str(p) for p in parts if not is_missing(p))
+
+
+class _UnionFind:
+    def __init__(self, items):
+        self.parent = {i: i for i in items}
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def _name_tokens(name):
+    n = normalize_name(name)
+    return set(n.split()) if n else set()
+
+
+def _city(row):
+    c = row.get("address_city")
+    return None if is_missing(c) else str(c).strip().lower()
+
+
+def _is_duplicate(a, b, evidence):
+    """Decision rule for a candidate pair given the kinds of evidence they share."""
+    ca, cb = _city(a), _city(b)
+    if ca and cb and ca != cb:
+        return False                          # branches of one organisation stay separate
+    if "name" in evidence or len(evidence) >= 2:
+        return True
+    ta, tb = _name_tokens(a.get("name")), _name_tokens(b.get("name"))
+    if not ta or not tb:
+        return True                           # one side has no usable name (e.g. an address)
+    return len(ta & tb) / len(ta | tb) >= NAME_JACCARD_THRESHOLD
+
+
+def cluster_duplicates(df: pd.DataFrame) -> pd.Series:
+    """Returns a cluster label per row (the smallest index position in its cluster)."""
+    records = df.to_dict(orient="records")
+    uf = _UnionFind(range(len(records)))
+    evidence = {}
+
+    # 1. Exact blocking keys (contact keys shared by many rows are directories, not identity)
+    blocks = {}
+    for i, r in enumerate(records):
+        for k in blocking_keys(r):
+            blocks.setdefault(k, []).append(i)
+    for k, members in blocks.items():
+        if len(members) < 2 or (k[0] != "name" and len(members) > MAX_BLOCK_SIZE):
+            continue
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                evidence.setdefault((members[x], members[y]), set()).add(k[0])
+
+    # 2. MinHash/LSH on description text
+    signatures = {}
+    buckets = {}
+    rows_per_band = NUM_PERM // BANDS
+    for i, r in enumerate(records):
+        sh = _shingles(_description_text(r))
+        if not sh:
+            continue
+        sig = minhash(sh)
+        signatures[i] = sig
+        for b in range(BANDS):
+            band = (b, sig[b * rows_per_band:(b + 1) * rows_per_band])
+            buckets.setdefault(band, []).append(i)
+
+    for members in buckets.values():
+        if len(members) < 2 or len(members) > MAX_BLOCK_SIZE:
+            continue
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                i, j = members[x], members[y]
+                est = sum(p == q for p, q in zip(signatures[i], signatures[j])) / NUM_PERM
+                if est >= JACCARD_THRESHOLD:
+                    evidence.setdefault((i, j), set()).add("desc")
+
+    # 3. Confirm candidates and merge clusters
+    for (i, j), kinds in evidence.items():
+        if _is_duplicate(records[i], records[j], kinds):
+            uf.union(i, j)
+
+    return pd.Series([uf.find(i) for i in range(len(records))], index=df.index, name="cluster_id")
+
+
+def _richness(row):
+    return sum(0 if is_missing(v) or (isinstance(v, str) and v in ("[]", "{}")) else 1 for v in row.values)
+
+
+def _merge_cluster(group):
+    """Richest row as base; fill gaps from the other members and union list columns."""
+    order = sorted(range(len(group)), key=lambda k: -_richness(group.iloc[k]))
+    base = group.iloc[order[0]].to_dict()
+    for k in order[1:]:
+        other = group.iloc[k]
+        for col, v in other.items():
+            if col in LIST_COLUMNS:
+                merged = _as_list(base.get(col))
+                seen = {json.dumps(x, sort_keys=True, default=str) for x in merged}
+                for x in _as_list(v):
+                    key = json.dumps(x, sort_keys=True, default=str)
+                    if key not in seen:
+                        seen.add(key)
+                        merged.append(x)
+                base[col] = merged if merged else base.get(col)
+            elif is_missing(base.get(col)) and not is_missing(v):
+                base[col] = v
+        # An address-looking name never wins over a real one
+        if looks_like_address(base.get("name")) and not is_missing(other.get("name")) \
+                and not looks_like_address(other.get("name")):
+            base["name"] = other.get("name")
+    return base
+
+
+def dedupe_for_enrichment(df: pd.DataFrame):
+    """
+    Returns (representatives_df, clusters) where clusters maps each representative's
+    pk_unique_id (as str) to the pk_unique_ids of all members (itself included).
+    """
+    df = df.reset_index(drop=True)
+    labels = cluster_duplicates(df)
+    reps, clusters = [], {}
+    for _label, group in df.groupby(labels, sort=True):
+        rep = _merge_cluster(group) if len(group) > 1 else group.iloc[0].to_dict()
+        reps.append(rep)
+        if "pk_unique_id" in group.columns:
+            clusters[str(rep.get("pk_unique_id"))] = list(group["pk_unique_id"])
+
+    reps_df = pd.DataFrame(reps, columns=df.columns)
+    print(f"🧬 Dedupe: {len(df)} rows -> {len(reps_df)} clusters "
+          f"({len(df) - len(reps_df)} near-duplicates skip enrichment)")
+    return reps_df, clusters
+
+
+def attach_members(enriched: pd.DataFrame, clusters, source_df: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Fans the representative's enrichment back out to its cluster as data, not rows:
+    each representative row lists its near-duplicates in duplicate_ids and
+    duplicate_source_urls, so the output (and the map built from it) has one
+    row - one marker - per facility.
+    """
+    if enriched.empty or not clusters:
+        return enriched
+    source_urls = {}
+    if source_df is not None and "pk_unique_id" in source_df.columns and "source_url" in source_df.columns:
+        source_urls = {str(k): v for k, v in zip(source_df["pk_unique_id"], source_df["source_url"])}
+
+    out = enriched.copy()
+    duplicates = [[str(m) for m in clusters.get(str(rep_id), []) if str(m) != str(rep_id)] for rep_id in out["id"]]
+    out["duplicate_ids"] = duplicates
+    out["duplicate_source_urls"] = [
+        [str(source_urls[m]) for m in members if not is_missing(source_urls.get(m))] for members in duplicates
+    ]
+    return out
+
+
+def folded_ids(output: pd.DataFrame):
+    """Ids already folded into a representative row of `output` (its duplicate_ids), as str."""
+    if output is None or "duplicate_ids" not in output.columns:
+        return set()
+    return {str(m) for v in output["duplicate_ids"] for m in _as_list(v) if not is_missing(m)}
@@ -1,13 +1,127 @@
 import os
+import sys
+import time
+import hashlib
+import threading
 import requests
 import json
 import re
 
-def call_llm(prompt, system_prompt="You are a helpful assistant", max_tokens=2000):
+# Runtime settings (set from the CLI or a notebook cell via configure())
+_SETTINGS = {
+    "cache_dir": os.environ.get("LLM_CACHE_DIR"),      # None = no response cache
+    "refresh_cache": False,                            # skip cache reads, still write fresh answers
+    "stats_path": os.environ.get("LLM_STATS_PATH"),    # JSONL of per-call latency/token stats
+    "dry_run": False,                                  # build prompts, never send them
+    "routing": os.environ.get("LLM_ROUTING", "1") != "0",  # small model first, escalate on failure
+    "small_model": os.environ.get("DATABRICKS_SMALL_MODEL_NAME", "databricks-meta-llama-3-1-8b-instruct"),
+    "min_confidence": 0.75,                            # share of expected fields that must be usable
+}
+_LOCK = threading.Lock()
+DRY_RUN_CALLS = []
+ROUTING_STATS = {}
+USAGE = {"calls": 0, "input_tokens": 0, "output_tokens": 0}   # real (uncached) calls this process
+
+def configure(**kwargs):
+    unknown = set(kwargs) - set(_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown llm_client settings: {sorted(unknown)}")
+    previous = {k: _SETTINGS[k] for k in kwargs}
+    _SETTINGS.update(kwargs)
+    return previous  # configure(**previous) restores them
+
+def estimate_tokens(text):
+    # ~4 characters per token for English/JSON text (no tokenizer dependency)
+    return max(1, len(text) // 4) if text else 0
+
+def _cache_path(model, system_prompt, prompt, max_tokens, schema=None):
+    key = hashlib.sha256(json.dumps([model, system_prompt, prompt, max_tokens, schema],
+                                    sort_keys=True).encode("utf-8")).hexdigest()
+    return os.path.join(_SETTINGS["cache_dir"], f"{key}.json")
+
+def tokens_used():
+    return USAGE["input_tokens"] + USAGE["output_tokens"]
+
+def _record_stats(entry):
+    with _LOCK:
+        USAGE["calls"] += 1
+        USAGE["input_tokens"] += entry["input_tokens"]
+        USAGE["output_tokens"] += entry["output_tokens"]
+    if not _SETTINGS["stats_path"]:
+        return
+    with _LOCK:
+        with open(_SETTINGS["stats_path"], "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+def recent_call_stats(path=None, last_n=2000):
+    """
+    Summary of the last `last_n` real calls from the stats log (None if no history):
+    per (agent, tier) and per tier: calls, mean/p90 latency and mean output tokens.
+    Tiers are "small", "large" and "followup" (see call_llm_routed).
+    """
+    path = path or _SETTINGS["stats_path"]
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()][-last_n:]
+    if not entries:
+        return None
+
+    def summarize(group):
+        lat = sorted(e["latency_s"] for e in group)
+        return {
+            "calls": len(group),
+            "mean_latency_s": sum(lat) / len(lat),
+            "p90_latency_s": lat[min(len(lat) - 1, int(len(lat) * 0.9))],
+            "mean_output_tokens": sum(e.get("output_tokens", 0) for e in group) / len(group),
+        }
+
+    by_agent, by_tier = {}, {}
+    for e in entries:
+        tier = e.get("tier") or "large"
+        by_agent.setdefault((e.get("agent"), tier), []).append(e)
+        by_tier.setdefault(tier, []).append(e)
+    return {
+        "calls": len(entries),
+        "by_agent": {k: summarize(v) for k, v in by_agent.items()},
+        "by_tier": {k: summarize(v) for k, v in by_tier.items()},
+    }
+
+def call_llm(prompt, system_prompt="You are a helpful assistant", max_tokens=2000, model=None, agent=None,
+             schema=None, tier=None):
+    """
+    Sends one chat completion. With `schema` (JSON Schema with a "title"), the schema is
+    sent as a forced tool call and the tool arguments (a JSON string) are returned.
+    `tier` only labels the call in the stats log (small / large / followup).
+    Structured answers are only cached once they pass the schema validator, so a
+    rejected answer is never replayed from the cache.
+    """
+    model = model or os.environ.get("DATABRICKS_MODEL_NAME", "databricks-meta-llama-3-3-70b-instruct")
+    caller = agent or sys._getframe(1).f_globals.get("__name__", "unknown")
+    # The tool definition is part of the request payload, so it counts as input
+    input_tokens = estimate_tokens(system_prompt) + estimate_tokens(prompt) + \
+        (estimate_tokens(json.dumps(schema)) if schema else 0)
+
+    if _SETTINGS["dry_run"]:
+        # A real run would answer these from the cache, so the projection treats them as free
+        cached = bool(_SETTINGS["cache_dir"]) and not _SETTINGS["refresh_cache"] and \
+            os.path.exists(_cache_path(model, system_prompt, prompt, max_tokens, schema))
+        with _LOCK:
+            DRY_RUN_CALLS.append({
+                "agent": caller, "model": model, "tier": tier, "max_tokens": max_tokens,
+                "input_tokens": input_tokens, "cached": cached,
+            })
+        return "{}"
+
+    if _SETTINGS["cache_dir"]:
+        cache_file = _cache_path(model, system_prompt, prompt, max_tokens, schema)
+        if os.path.exists(cache_file) and not _SETTINGS["refresh_cache"]:
+            with open(cache_file) as f:
+                return json.load(f)["content"]
+
     host = os.environ.get("DATABRICKS_HOST", "").rstrip("/")
     token = os.environ.get("DATABRICKS_TOKEN")
-    model = os.environ.get("DATABRICKS_MODEL_NAME", "databricks-meta-llama-3-3-70b-instruct")
-    
+
     if not host or not token:
         raise Exception("Missing DATABRICKS_HOST or DATABRICKS_TOKEN.")
 
@@ -20,15 +134,261 @@ def call_llm(prompt, system_prompt="You are a helpful assistant", max_tokens=200
         "max_tokens": max_tokens,
         "temperature": 0.1 # Slight temp helps avoid repetition loops
     }
-    
+    if schema:
+        # Same pattern as the parse_query tool in the ai-search function
+        name = schema.get("title", "structured_output")
+        body["tools"] = [{
+            "type": "function",
+            "function": {"name": name, "description": schema.get("description", name),
+                         "parameters": {k: v for k, v in schema.items() if k not in ("title", "description")}},
+        }]
+        body["tool_choice"] = {"type": "function", "function": {"name": name}}
+
     try:
+        start = time.time()
         response = requests.post(f"{host}/serving-endpoints/{model}/invocations", headers=headers, json=body, timeout=60)
         if response.status_code != 200:
             raise Exception(f"API Error {response.status_code}: {response.text}")
-        
-        return response.json()['choices'][0]['message']['content']
+
+        payload = response.json()
+        message = payload['choices'][0]['message']
+        tool_calls = message.get('tool_calls')
+        if schema and tool_calls:
+            content = tool_calls[0]['function']['arguments']
+            if not isinstance(content, str):
+                content = json.dumps(content)
+        else:
+            content = message['content']
+    except Exception as e:
+        raise Exception(f"LLM Connection Failed: {e}") from e
+
+    usage = payload.get("usage") or {}
+    _record_stats({
+        "agent": caller, "model": model, "tier": tier or "large", "latency_s": round(time.time() - start, 3),
+        "input_tokens": usage.get("prompt_tokens", input_tokens),
+        "output_tokens": usage.get("completion_tokens", estimate_tokens(content)),
+    })
+
+    if _SETTINGS["cache_dir"] and (not schema or _is_valid(content, schema)):
+        os.makedirs(_SETTINGS["cache_dir"], exist_ok=True)
+        with open(cache_file, "w") as f:
+            json.dump({"content": content}, f)
+
+    return content
+
+def _is_valid(content, schema):
+    try:
+        return not compile_schema(schema)(parse_json_safe(content))
+    except ValueError:
+        return False
+
+_JSON_TYPES = {"object": dict, "array": list, "string": str, "number": (int, float),
+               "integer": int, "boolean": bool, "null": type(None)}
+
+def _compile(schema):
+    """Compiles a JSON Schema subset (type, enum, properties, required, items) into value -> bool."""
+    types = schema.get("type")
+    types = [types] if isinstance(types, str) else types
+    enum = schema.get("enum")
+    props = {k: _compile(v) for k, v in schema.get("properties", {}).items()}
+    required = schema.get("required", [])
+    items = _compile(schema["items"]) if "items" in schema else None
+
+    def check(v):
+        if types and not any(isinstance(v, _JSON_TYPES[t]) and not (t in ("number", "integer") and isinstance(v, bool))
+                             for t in types):
+            return False
+        if enum is not None and v not in enum:
+            return False
+        if isinstance(v, dict):
+            if any(k not in v for k in required):
+                return False
+            if any(k in v and not c(v[k]) for k, c in props.items()):
+                return False
+        if isinstance(v, list) and items is not None and not all(items(x) for x in v):
+            return False
+        return True
+    return check
+
+_VALIDATORS = {}
+
+def compile_schema(schema):
+    """
+    Precompiled validator for an agent's output schema (cached per title and field set,
+    since sub_schema keeps one title for every subset).
+    Returns fn(data) -> list of top-level fields that are missing or invalid.
+    """
+    key = (schema.get("title") or json.dumps(schema, sort_keys=True), tuple(schema.get("properties", {})))
+    if key not in _VALIDATORS:
+        fields = {k: _compile(v) for k, v in schema.get("properties", {}).items()}
+        required = set(schema.get("required", fields))
+
+        def validate(data):
+            if not isinstance(data, dict):
+                return sorted(required)
+            return [k for k, c in fields.items() if (k in required and k not in data) or (k in data and not c(data[k]))]
+        _VALIDATORS[key] = validate
+    return _VALIDATORS[key]
+
+def sub_schema(schema, fields):
+    """Schema restricted to `fields` (used to re-ask only what is missing)."""
+    return {
+        **schema,
+        "title": f"{schema.get('title', 'structured_output')}_followup",
+        "properties": {k: v for k, v in schema.get("properties", {}).items() if k in fields},
+        "required": [k for k in schema.get("required", []) if k in fields],
+    }
+
+def _empty_fields(data, schema):
+    return [k for k in schema.get("properties", {}) if data.get(k) in ("", [], {}, None)]
+
+def _rejections(answer, fields, schema):
+    """One line per rejected field: the value the model returned and what the schema expects."""
+    lines = []
+    for k in fields:
+        expected = json.dumps(schema["properties"][k])[:300]
+        if k in answer:
+            lines.append(f"- {k}: got {json.dumps(answer[k], default=str)[:300]}, expected {expected}")
+        else:
+            lines.append(f"- {k}: missing, expected {expected}")
+    return "\n".join(lines)
+
+def _track(agent, tier, latency, escalated=False):
+    with _LOCK:
+        s = ROUTING_STATS.setdefault(agent, {"small_ok": 0, "escalated": 0, "large_only": 0, "followups": 0,
+                                             "small_latency_s": 0.0, "large_latency_s": 0.0,
+                                             "followup_latency_s": 0.0})
+        if tier == "small":
+            s["small_latency_s"] += latency
+            if not escalated:
+                s["small_ok"] += 1
+        elif tier == "followup":
+            s["followup_latency_s"] += latency
+            s["followups"] += 1
+        else:
+            s["large_latency_s"] += latency
+            s["escalated" if escalated else "large_only"] += 1
+
+def error_info(e):
+    """Dead-letter fields for an exception (the underlying cause's class, not the wrapper's)."""
+    return {"error_class": type(e.__cause__ or e).__name__, "error": str(e)}
+
+def incomplete_info(schema, data):
+    """Dead-letter fields when a routed answer still lacks required fields (None if complete)."""
+    missing = [k for k in schema.get("required", []) if k not in data]
+    if missing:
+        return {"error_class": "IncompleteOutput", "error": f"Missing fields after follow-up: {missing}"}
+    return None
+
+def _structured_call(prompt, schema, system_prompt, max_tokens, model, agent, errors, tier):
+    try:
+        return parse_json_safe(call_llm(prompt, system_prompt, max_tokens, model=model, agent=agent,
+                                        schema=schema, tier=tier))
     except Exception as e:
-        raise Exception(f"LLM Connection Failed: {e}")
+        errors.append(e)
+        return {}
+
+def call_llm_routed(prompt, schema, system_prompt="Output ONLY valid JSON.", max_tokens=2000):
+    """
+    Schema-constrained, tiered call. The small model answers first; fields that are
+    invalid (or empty, when confidence is below min_confidence) are escalated to the
+    large model (DATABRICKS_MODEL_NAME) with a schema restricted to those fields.
+    Anything still invalid gets one targeted follow-up that quotes the rejected values
+    and what the schema expects. Only valid fields are returned, so callers keep their
+    defaults for the rest (incomplete_info reports them to the dead-letter store).
+    If every attempt raised, the last error is re-raised.
+    """
+    agent = sys._getframe(1).f_globals.get("__name__", "unknown")
+    validate = compile_schema(schema)
+    fields = list(schema.get("properties", {}))
+
+    if _SETTINGS["dry_run"]:
+        # Only the first tier is recorded; the CLI projects escalations from the stats log
+        call_llm(prompt, system_prompt, max_tokens, agent=agent, schema=schema,
+                 model=_SETTINGS["small_model"] if _SETTINGS["routing"] else None,
+                 tier="small" if _SETTINGS["routing"] else "large")
+        return {}
+
+    data, todo, errors, attempts = {}, fields, [], 0
+    if _SETTINGS["routing"]:
+        start = time.time()
+        attempts += 1
+        data = _structured_call(prompt, schema, system_prompt, max_tokens, _SETTINGS["small_model"], agent, errors,
+                                "small")
+        invalid = validate(data)
+        data = {k: v for k, v in data.items() if k in fields and k not in invalid}
+        # Invalid fields are already gone from `data`; only valid ones can count as empty
+        empty = [k for k in _empty_fields(data, schema) if k not in invalid]
+        confidence = 1 - (len(invalid) + len(empty)) / len(fields) if fields else 1.0
+        todo = invalid if confidence >= _SETTINGS["min_confidence"] else \
+            sorted(set(invalid) | set(empty), key=fields.index)
+        _track(agent, "small", time.time() - start, escalated=bool(todo))
+        if not todo:
+            return data
+
+    # Large model: whole schema on a direct call, only the failing fields after the small tier
+    answer = {}
+    for tier in ("large", "followup"):
+        ask = schema if len(todo) == len(fields) else sub_schema(schema, todo)
+        ask_prompt = prompt if ask is schema else (
+            f"{prompt}\n\nReturn ONLY these fields, following the schema exactly: {', '.join(todo)}")
+        if tier == "followup":
+            # Quote the rejected values so the follow-up differs from the escalation call
+            ask_prompt = (f"{prompt}\n\nYour previous answer was rejected by schema validation:\n"
+                          f"{_rejections(answer, todo, schema)}\n\n"
+                          f"Return ONLY these fields, corrected to match the schema exactly: {', '.join(todo)}")
+        start = time.time()
+        attempts += 1
+        answer = _structured_call(ask_prompt, ask, system_prompt, max_tokens, None, agent, errors, tier)
+        invalid = validate({**data, **answer})
+        data.update({k: v for k, v in answer.items() if k in todo and k not in invalid})
+        _track(agent, tier, time.time() - start, escalated=_SETTINGS["routing"])
+        todo = [k for k in todo if k in invalid]
+        if not todo:
+            break
+
+    if errors and len(errors) == attempts:
+        raise errors[-1]
+    return data
+
+def routing_report():
+    """
+    Per-agent escalation rate and latency saved versus sending everything to the large model.
+    The large-model latency of non-escalated calls is estimated from observed large calls.
+    """
+    report = {}
+    all_large = sum(s["large_latency_s"] for s in ROUTING_STATS.values())
+    all_large_n = sum(s["escalated"] + s["large_only"] for s in ROUTING_STATS.values())
+    for agent, s in ROUTING_STATS.items():
+        routed = s["small_ok"] + s["escalated"]
+        large_n = s["escalated"] + s["large_only"]
+        if large_n:
+            large_mean = s["large_latency_s"] / large_n
+        elif all_large_n:
+            large_mean = all_large / all_large_n
+        else:
+            large_mean = None
+        baseline = large_mean * (routed + s["large_only"]) if large_mean is not None else None
+        actual = s["small_latency_s"] + s["large_latency_s"] + s["followup_latency_s"]
+        report[agent] = {
+            "calls": routed + s["large_only"],
+            "followups": s["followups"],
+            "escalation_rate": s["escalated"] / routed if routed else None,
+            "latency_s": round(actual, 2),
+            "latency_saved_s": round(baseline - actual, 2) if baseline is not None and routed else None,
+        }
+    return report
+
+def print_routing_report():
+    report = routing_report()
+    if not report or _SETTINGS["dry_run"]:
+        return
+    print("\n--- 🔀 MODEL ROUTING ---")
+    for agent, r in sorted(report.items()):
+        rate = "n/a" if r["escalation_rate"] is None else f"{r['escalation_rate']:.0%}"
+        saved = "n/a" if r["latency_saved_s"] is None else f"{r['latency_saved_s']:.1f}s"
+        print(f"  {agent:<32} calls={r['calls']:<6} escalated={rate:<5} followups={r['followups']:<4} "
+              f"latency={r['latency_s']:.1f}s saved={saved}")
 
 def parse_json_safe(text):
     """
@@ -1,48 +1,197 @@
 """
 Orchestrator matching user filenames.
-Flow: Splitter -> Cleaner -> Scope -> Reliability
+Flow: (Dedupe) -> Splitter -> Cleaner -> Scope -> Reliability -> (Attach duplicates)
 """
+import copy
 import json
+import threading
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
 # Imports using your specific filenames
 from agent_1_capabilities_splitter import process_row as process_agent1
 from agent_2_cleaner_formatter import process as process_agent2
 from agent_3_capability_scope import process as process_agent3
 from agent_4_reliability import process as process_agent4
+from dedup import dedupe_for_enrichment, attach_members
+import llm_client
+from llm_client import print_routing_report
+from scheduler import order_rows
+from dead_letter import DeadLetterStore, STAGES, STAGE_FIELDS
 
-def run_pipeline(df: pd.DataFrame) -> pd.DataFrame:
-    final_output_rows = []
-    
-    print(f"🔄 Processing {len(df)} rows through the 4-Agent Pipeline...")
+def _stage_inputs(stage, state):
+    if stage == "agent_1":
+        return {"raw_row": state["raw_row"]}
+    if stage == "agent_2":
+        return {"canonical": state["canonical"]}
+    return {"canonical": state["canonical"], "translated": state["translated"]}
+
+def _run_stage(stage, state):
+    """Runs one agent on `state` in place; returns its degradation info (or None)."""
+    if stage == "agent_1":
+        # --- Agent 1: Splitter ---
+        res = process_agent1(state["raw_row"])
+        state["canonical"] = res["canonical"]
+    elif stage == "agent_2":
+        # --- Agent 2: Cleaner/Formatter ---
+        res = process_agent2(state["canonical"])
+    elif stage == "agent_3":
+        # --- Agent 3: Capability Scope ---
+        res = process_agent3(state["canonical"], state["translated"])
+    else:
+        # --- Agent 4: Reliability Audit ---
+        res = process_agent4(state["canonical"], state["translated"])
+    if "translated" in res:
+        state["translated"] = res["translated"]
+    return res.get("degraded")
+
+def _row_id(state):
+    for src, key in (("canonical", "id"), ("raw_row", "pk_unique_id"), ("translated", "id")):
+        v = (state.get(src) or {}).get(key)
+        if v is not None and v == v:
+            return v
+    return (state.get("raw_row") or {}).get("name")
 
-    for index, r in df.iterrows():
+def process_single_row(raw_row, dead_letter=None, state=None, stages=STAGES):
+    """
+    Runs `stages` in order. A degraded stage is recorded and the row continues;
+    a stage that raises is recorded (with the stages it blocked) and the row stops,
+    keeping whatever the earlier stages produced. A clean stage resolves any open
+    entry for it, so a later replay cannot overwrite its fresh output.
+    """
+    state = state if state is not None else {"raw_row": raw_row}
+    for n, stage in enumerate(stages):
+        # Agents mutate `translated` in place, so snapshot the inputs first
+        inputs = copy.deepcopy(_stage_inputs(stage, state))
         try:
-            raw_row = r.to_dict()
-            
-            # --- Agent 1: Splitter ---
-            res1 = process_agent1(raw_row)
-            canonical = res1["canonical"]
-            
-            # --- Agent 2: Cleaner/Formatter ---
-            res2 = process_agent2(canonical)
-            translated = res2["translated"]
-            
-            # --- Agent 3: Capability Scope ---
-            res3 = process_agent3(canonical, translated)
-            translated = res3["translated"]
-            
-            # --- Agent 4: Reliability Audit ---
-            res4 = process_agent4(canonical, translated)
-            final_record = res4["translated"]
-            
-            final_output_rows.append(final_record)
-            
-            if (index + 1) % 5 == 0:
-                print(f"✅ Completed {index + 1} rows...")
+            degraded = _run_stage(stage, state)
+        except Exception as e:
+            if dead_letter:
+                dead_letter.record(_row_id(state), stage, inputs, type(e).__name__, e, pending=stages[n + 1:])
+            print(f"❌ {stage} failed on row {_row_id(state)}: {e}")
+            return state.get("translated")
+        if degraded and dead_letter:
+            dead_letter.record(_row_id(state), stage, inputs, degraded["error_class"], degraded["error"],
+                               degraded=True)
+        elif dead_letter and dead_letter.is_open(_row_id(state), stage):
+            dead_letter.resolve(_row_id(state), stage)
+    return state["translated"]
+
+def run_pipeline(df: pd.DataFrame, dedupe: bool = True, concurrency: int = 1,
+                 priority=None, budget=None, existing: pd.DataFrame = None, dead_letter=None) -> pd.DataFrame:
+    """
+    dead_letter: DeadLetterStore for failed/degraded stages (default: dead_letter.jsonl, False disables).
+    priority: e.g. ("region", "richness") - see scheduler.order_rows (existing = previous output).
+    budget:   scheduler.Budget; once exhausted no new row starts and rows in flight finish.
+              Deferred rows are left out (resume later with the CLI); a row whose stage
+              raised is still returned with what the earlier stages produced and is
+              dead-lettered for replay_dead_letters.
+    """
+    source_df, clusters = df, {}
+    lock = threading.Lock()
+    if dead_letter is None:
+        dead_letter = DeadLetterStore()
+
+    # --- Dedupe: enrich one representative per near-duplicate cluster ---
+    if dedupe:
+        df, clusters = dedupe_for_enrichment(df)
+
+    # --- Schedule: most valuable rows first, so a bounded run stops on a useful subset ---
+    if priority:
+        df = order_rows(df, priority, existing)
+
+    print(f"🔄 Processing {len(df)} rows through the 4-Agent Pipeline...")
+
+    rows = [r.to_dict() for _, r in df.iterrows()]
 
+    def _run(item):
+        n, raw_row = item
+        if budget is not None and budget.exhausted():
+            with lock:
+                budget.deferred += 1
+            return None
+        try:
+            record = process_single_row(raw_row, dead_letter=dead_letter)
+            if (n + 1) % 5 == 0:
+                print(f"✅ Completed {n + 1} rows...")
+            return record
         except Exception as e:
-            print(f"❌ Error on row {index} ({raw_row.get('name', 'Unknown')}): {e}")
-            continue
+            print(f"❌ Error on row {n} ({raw_row.get('name', 'Unknown')}): {e}")
+            return None
+
+    # Rows are independent, so they can run on a thread pool (LLM calls are I/O bound)
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(_run, enumerate(rows)))
+    else:
+        results = [_run(item) for item in enumerate(rows)]
+
+    final_output_rows = [r for r in results if r is not None]
+    print_routing_report()
+    if budget is not None:
+        print(f"⏹️ Budget: {budget.summary()}")
+    if dead_letter:
+        for stage, counts in sorted(dead_letter.summary().items()):
+            print(f"📮 Dead letters {stage}: {counts['failed']} failed, {counts['degraded']} degraded")
+
+    result = pd.DataFrame(final_output_rows)
+    return attach_members(result, clusters, source_df) if dedupe else result
+
+class _ReplayLetters:
+    """Collects what a replayed row would dead-letter, for DeadLetterStore.record."""
+
+    def __init__(self):
+        self.recorded = []
+
+    def is_open(self, row_id, stage):
+        return False  # _replay_entry resolves the replayed entry itself, after the merge
+
+    def record(self, row_id, stage, inputs, error_class, error, degraded=False, pending=()):
+        self.recorded.append({"row_id": row_id, "stage": stage, "inputs": inputs, "error_class": error_class,
+                              "error": error, "degraded": degraded, "pending": pending})
+
+def replay_dead_letters(output: pd.DataFrame, dead_letter=None, stages=None, ids=None) -> pd.DataFrame:
+    """
+    Re-runs only the dead-lettered stages (plus the stages a hard failure blocked)
+    from their stored inputs, and merges the fields those stages own into `output`.
+    The LLM cache is not read during replay (it would return the answer that failed);
+    an entry is resolved only once its stages succeeded and were merged.
+    """
+    dead_letter = dead_letter or DeadLetterStore()
+    entries = dead_letter.entries(stages=stages, ids=ids)
+    print(f"🔁 Replaying {len(entries)} dead-lettered stages...")
+    rows = output.to_dict(orient="records") if output is not None else []
+    previous = llm_client.configure(refresh_cache=True)
+    try:
+        for e in entries:
+            rows = _replay_entry(e, rows, dead_letter)
+    finally:
+        llm_client.configure(**previous)
+    return pd.DataFrame(rows)
+
+def _replay_entry(e, rows, dead_letter):
+    """Replays one dead-letter entry; returns `rows` with the re-run fields merged in."""
+    stage = e["stage"]
+    todo = (stage,) + tuple(e.get("pending", ())) if not e["degraded"] else (stage,)
+    state = copy.deepcopy(e["inputs"])
+    # Re-runs record into a scratch store, so the entry stays open until the merge is done
+    retry = _ReplayLetters()
+    record = process_single_row(state.get("raw_row"), dead_letter=retry, state=state, stages=todo)
+    for x in retry.recorded:
+        dead_letter.record(**x)
+    if record is None or any(x["stage"] == stage for x in retry.recorded):
+        return rows  # failed or degraded again: a fresh entry was recorded, keep the current output
 
-    return pd.DataFrame(final_output_rows)
\ No newline at end of file
+    # A blocked stage that raises now has its own entry; only merge what ran before it
+    failed = [todo.index(x["stage"]) for x in retry.recorded if not x["degraded"]]
+    fields = [f for s in todo[:min(failed, default=len(todo))] for f in STAGE_FIELDS[s]]
+    targets = [r for r in rows if str(r.get("id")) == e["row_id"]]
+    if not targets or stage == "agent_1":
+        rows = [r for r in rows if str(r.get("id")) != e["row_id"]]
+        rows.append(record)
+    else:
+        for r in targets:
+            for f in fields:
+                r[f] = record.get(f)
+    dead_letter.resolve(e["row_id"], stage)
+    return rows
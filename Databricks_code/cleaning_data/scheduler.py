@@ -0,0 +1,170 @@
+"""
+Priority ordering and budgets for bounded enrichment runs.
+Rows are ordered so that stopping early still gives the most useful partial output
+(e.g. every region gets some enriched facilities before any region gets all of them).
+"""
+import json
+import time
+import pandas as pd
+
+import llm_client
+from columnar_io import is_missing
+
+# Built-in priorities, applied lexicographically in the order given
+PRIORITIES = ("region", "richness", "stale")
+
+
+def _list_len(v):
+    if is_missing(v):
+        return 0
+    if isinstance(v, str):
+        try:
+            v = json.loads(v)
+        except json.JSONDecodeError:
+            return 1
+    return len(v) if hasattr(v, "__len__") and not isinstance(v, (str, dict)) else 1
+
+
+def _normalize(v):
+    # "Ga East Municipality, Greater Accra Region" -> "greater accra"
+    name = str(v).split(",")[-1].strip().lower()
+    return name[:-len(" region")] if name.endswith(" region") else name
+
+
+def city_regions(rows):
+    """
+    City -> most common region among `rows` (raw rows or location_info dicts) that give
+    both. Names used more often as a region than as a city ("Western") are left out,
+    and cities filed under another city ("Osu" -> "Accra") follow it to its region.
+    """
+    counts, as_city, as_region = {}, {}, {}
+    for row in rows:
+        city, region = row.get("address_city"), row.get("address_stateOrRegion")
+        city = None if is_missing(city) else _normalize(city)
+        region = None if is_missing(region) else _normalize(region)
+        if city:
+            as_city[city] = as_city.get(city, 0) + 1
+        if region:
+            as_region[region] = as_region.get(region, 0) + 1
+        if city and region and city != region:
+            by_region = counts.setdefault(city, {})
+            by_region[region] = by_region.get(region, 0) + 1
+    cities = {city: max(by_region, key=by_region.get) for city, by_region in counts.items()
+              if as_city[city] >= as_region.get(city, 0)}
+    for city, region in cities.items():
+        seen = {city}
+        while region in cities and region not in seen:
+            seen.add(region)
+            region = cities[region]
+        cities[city] = region
+    return cities
+
+
+def region_of(row, cities=None):
+    """
+    Normalized region of a raw row or location_info dict. A missing region, or one
+    that is really a city ("Accra"), is looked up in `cities` (see city_regions);
+    a city alone never becomes its own region.
+    """
+    cities = cities or {}
+    region, city = row.get("address_stateOrRegion"), row.get("address_city")
+    if not is_missing(region):
+        region = _normalize(region)
+        return cities.get(region, region)
+    if not is_missing(city):
+        return cities.get(_normalize(city), "unknown")
+    return "unknown"
+
+
+def _location(record):
+    """location_info of an already-enriched record (dict or JSON string), or None."""
+    loc = record.get("location_info")
+    if isinstance(loc, str):
+        try:
+            loc = json.loads(loc)
+        except json.JSONDecodeError:
+            loc = None
+    return loc if isinstance(loc, dict) else None
+
+
+def _enriched_region(record, cities=None):
+    """Region of an already-enriched record, from its location_info."""
+    loc = _location(record)
+    region = region_of(loc, cities) if loc else "unknown"
+    return None if region == "unknown" else region
+
+
+def richness(row):
+    """Amount of raw evidence the agents can work with."""
+    return _list_len(row.get("capability")) + _list_len(row.get("procedure"))
+
+
+def order_rows(df: pd.DataFrame, priority=("region", "richness"), existing: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Returns df reordered by `priority`:
+      region   - regions with the fewest enriched facilities first (round-robin across regions)
+      richness - rows with the most raw capability/procedure entries first
+      stale    - never-enriched rows first, then the oldest created_at in `existing`
+    """
+    unknown = set(priority) - set(PRIORITIES)
+    if unknown:
+        raise ValueError(f"Unknown priorities {sorted(unknown)}; choose from {PRIORITIES}")
+    if df.empty or not priority:
+        return df
+
+    ids = df["pk_unique_id"].astype(str) if "pk_unique_id" in df.columns else pd.Series([None] * len(df), index=df.index)
+    enriched_at = {}
+    if existing is not None and not existing.empty and "id" in existing.columns:
+        created = existing["created_at"] if "created_at" in existing.columns else pd.Series([""] * len(existing))
+        enriched_at = {str(i): str(c) for i, c in zip(existing["id"], created)}
+
+    records = df.to_dict(orient="records")
+    enriched = existing.to_dict(orient="records") if existing is not None and "id" in existing.columns else []
+    # Input rows and enriched location_info share one city -> region map, so both sides use the same keys
+    cities = city_regions(records + [loc for loc in map(_location, enriched) if loc])
+    keys = pd.DataFrame(index=range(len(records)))
+    keys["richness"] = [-richness(r) for r in records]
+    keys["stale"] = [(1, enriched_at[i]) if i in enriched_at else (0, "") for i in ids]
+    keys["region"] = [region_of(r, cities) for r in records]
+
+    if "region" in priority:
+        # Coverage so far per region, then each row's turn within its region
+        covered = {}
+        input_region = {i: reg for i, reg in zip(ids, keys["region"])}
+        if enriched:
+            for rec in enriched:
+                reg = _enriched_region(rec, cities) or input_region.get(str(rec.get("id")))
+                if reg:
+                    covered[reg] = covered.get(reg, 0) + 1
+        within = [k for k in priority if k != "region"]
+        keys["_pos"] = range(len(records))
+        ordered_within = keys.sort_values(within + ["_pos"]) if within else keys
+        rank = ordered_within.groupby("region").cumcount()
+        keys["region"] = [covered.get(reg, 0) + rank[n] for n, reg in enumerate(keys["region"])]
+
+    order = keys.sort_values(list(priority), kind="stable").index
+    return df.iloc[list(order)]
+
+
+class Budget:
+    """Wall-clock and/or token budget; checked before each row starts (in-flight rows finish)."""
+
+    def __init__(self, max_seconds=None, max_tokens=None):
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.start = time.time()
+        self.tokens_at_start = llm_client.tokens_used()
+        self.deferred = 0
+
+    def tokens(self):
+        return llm_client.tokens_used() - self.tokens_at_start
+
+    def exhausted(self):
+        if self.max_seconds is not None and time.time() - self.start >= self.max_seconds:
+            return True
+        if self.max_tokens is not None and self.tokens() >= self.max_tokens:
+            return True
+        return False
+
+    def summary(self):
+        return f"{time.time() - self.start:.0f}s, {self.tokens()} tokens, {self.deferred} rows deferred"
@@ -0,0 +1,75 @@
+import json
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from columnar_io import STRUCT_COLUMNS, export_csv, read_parquet, write_parquet
+
+ENRICHED = ["organization_info", "location_info", "contact_info", "medical_details", "stats",
+            "reliability_reasons", "capability_reasons"]
+
+
+def _enriched_frame():
+    # Values exactly as agents 2-4 write them (json.dumps of the LLM output / defaults)
+    return pd.DataFrame([
+        {"id": 1.0, "name": "A", "acceptsVolunteers": True,
+         "organization_info": json.dumps({"organization_type": "facility", "year_established": 1990}),
+         "location_info": json.dumps({"address_city": "Accra", "address_country": "Ghana"}),
+         "contact_info": json.dumps({"phone_numbers": ["+233 1"], "websites": [], "email": None}),
+         "medical_details": json.dumps({"specialties": ["x"], "procedures": ["y", "z"]}),
+         "stats": json.dumps({"score": 80}),
+         "reliability_reasons": json.dumps(["ok", "Évaluation"]), "capability_reasons": "[]"},
+        {"id": 2.0, "name": "B", "acceptsVolunteers": False,
+         "organization_info": json.dumps({"organization_type": "ngo"}),
+         "location_info": "{}",
+         "contact_info": "{}",
+         "medical_details": json.dumps({"specialties": [], "beds": {"icu": 2}}),
+         "stats": json.dumps({"score": 50, "note": "Heuristic Default"}),
+         "reliability_reasons": json.dumps(["Auto-assigned Low"]), "capability_reasons": "[]"},
+        {"id": 3.0, "name": "C", "acceptsVolunteers": None,
+         "organization_info": json.dumps({"organization_type": "facility", "year_established": "1990s"}),
+         "location_info": json.dumps({"address_city": None}),
+         "contact_info": json.dumps({"email": "c@d.org"}),
+         "medical_details": "{}",
+         "stats": json.dumps({"score": 72.5}),
+         "reliability_reasons": "[]", "capability_reasons": "[]"},
+    ])
+
+
+def test_csv_export_round_trip_matches_legacy_csv(tmp_path):
+    df = _enriched_frame()
+    df.to_csv(tmp_path / "legacy.csv", index=False)
+
+    write_parquet(df, tmp_path / "out.parquet")
+    export_csv(read_parquet(tmp_path / "out.parquet"), tmp_path / "export.csv")
+
+    legacy = pd.read_csv(tmp_path / "legacy.csv", dtype=str, keep_default_na=False)
+    exported = pd.read_csv(tmp_path / "export.csv", dtype=str, keep_default_na=False)
+    for col in ENRICHED + ["acceptsVolunteers"]:
+        assert exported[col].tolist() == legacy[col].tolist(), col
+
+
+def test_struct_fields_keep_types_and_keys(tmp_path):
+    write_parquet(_enriched_frame(), tmp_path / "out.parquet")
+    out = read_parquet(tmp_path / "out.parquet", columns=STRUCT_COLUMNS + ["acceptsVolunteers"])
+
+    assert out["stats"][0] == {"score": 80}
+    assert out["stats"][2] == {"score": 72.5}
+    assert out["organization_info"][0]["year_established"] == 1990
+    assert out["location_info"][1] == {}
+    assert out["location_info"][2] == {"address_city": None}
+    assert out["contact_info"][2] == {"email": "c@d.org"}
+    assert out["acceptsVolunteers"].tolist()[:2] == [True, False]
+
+
+def test_parquet_schema_uses_native_types(tmp_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    write_parquet(_enriched_frame().head(2), tmp_path / "out.parquet")
+    schema = pq.read_schema(tmp_path / "out.parquet")
+    assert schema.field("stats").type.field("score").type == pa.int64()
+    assert schema.field("acceptsVolunteers").type == pa.bool_()
+    assert schema.field("contact_info").type.field("phone_numbers").type == pa.list_(pa.string())
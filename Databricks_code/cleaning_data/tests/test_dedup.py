@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+import pytest
+
+from dedup import cluster_duplicates, dedupe_for_enrichment, looks_like_address, normalize_name
+
+CLEAN_VIRT = os.path.join(os.path.dirname(__file__), "..", "..", "clean_virt.csv")
+
+
+@pytest.fixture(scope="module")
+def clean_virt():
+    return pd.read_csv(CLEAN_VIRT)
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("109/No 1 Bekwai Rd (Near Mexico Hotel) Takoradi, Ghana", True),
+    ("37 Military Hospital", False),                      # digits alone are not an address
+    ("Police Clinic, Maxwell Road", False),               # name first, address after
+    ("Marie Stopes Ghana, 26 Akwei Street, Tesano, Accra, Ghana", False),
+    ("Central Regional Police Clinic", False),
+])
+def test_looks_like_address(name, expected):
+    assert looks_like_address(name) is expected
+
+
+def test_normalize_name_strips_address_suffix_and_keeps_numbered_names():
+    assert normalize_name("Marie Stopes Ghana, 26 Akwei Street, Tesano, Accra, Ghana") == "marie stopes"
+    assert normalize_name("Marie Stopes Ghana") == "marie stopes"
+    assert normalize_name("37 Military Hospital") == "37 military hospital"
+    assert normalize_name("St. John Ambulance Ghana") == "saint john ambulance"
+    assert normalize_name("109/No 1 Bekwai Rd (Near Mexico Hotel) Takoradi, Ghana") is None
+
+
+def _cluster_of(df, labels, pk):
+    label = labels[df.index[df["pk_unique_id"] == pk][0]]
+    return set(df.loc[labels == label, "pk_unique_id"])
+
+
+def test_cluster_duplicates_on_clean_virt(clean_virt):
+    labels = cluster_duplicates(clean_virt)
+    # Shared phones and website
+    assert _cluster_of(clean_virt, labels, 184.0) == {184.0, 274.0}
+    # Same name once the address suffix is stripped
+    assert _cluster_of(clean_virt, labels, 445.0) == {445.0, 449.0}
+    # 'St.' == 'Saint'
+    assert _cluster_of(clean_virt, labels, 613.0) == {613.0, 675.0}
+    # Branches of one organisation in different cities stay separate
+    marie_stopes = clean_virt[clean_virt["name"] == "Marie Stopes Ghana"]["pk_unique_id"]
+    assert len({labels[i] for i in marie_stopes.index}) == len(marie_stopes)
+
+
+def test_dedupe_for_enrichment_lists_members(clean_virt):
+    reps, clusters = dedupe_for_enrichment(clean_virt)
+    assert len(reps) == len(clusters) == 790
+    folded = sorted(sorted(members) for members in clusters.values() if len(members) > 1)
+    assert len(folded) == 7
+    assert [184.0, 274.0] in folded
+    assert set(clusters) == set(reps["pk_unique_id"].astype(str))
@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+import llm_client
+from llm_client import call_llm_routed
+
+SCHEMA = {
+    "title": "test_output",
+    "type": "object",
+    "properties": {"a": {"type": "integer"}, **{k: {"type": "string"} for k in "bcdefgh"}},
+    "required": list("abcdefgh"),
+}
+FIELDS = list("abcdefgh")
+
+
+def _answer(**overrides):
+    return {**{k: k.upper() for k in "bcdefgh"}, "a": 1, **overrides}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Replaces call_llm with scripted answers per tier; yields (answers, calls made)."""
+    previous = llm_client.configure(cache_dir=None, stats_path=None, dry_run=False, routing=True)
+    answers, calls = {}, []
+
+    def fake_call_llm(prompt, system_prompt="", max_tokens=2000, model=None, agent=None, schema=None, tier=None):
+        calls.append({"tier": tier, "prompt": prompt, "fields": list(schema["properties"])})
+        return json.dumps(answers[tier])
+
+    monkeypatch.setattr(llm_client, "call_llm", fake_call_llm)
+    yield answers, calls
+    llm_client.configure(**previous)
+
+
+def test_invalid_field_is_not_also_counted_as_empty(stub):
+    answers, calls = stub
+    answers.update(small=_answer(a="one", b=""), large={"a": 1})
+
+    assert call_llm_routed("p", SCHEMA) == _answer(b="")
+    # 1 invalid + 1 empty of 8 = 0.75 confidence: only the invalid field is escalated
+    assert [(c["tier"], c["fields"]) for c in calls] == [("small", FIELDS), ("large", ["a"])]
+
+
+def test_low_confidence_escalates_invalid_and_empty_fields(stub):
+    answers, calls = stub
+    answers.update(small=_answer(a="one", b="", c=""), large={"a": 1, "b": "B", "c": "C"})
+
+    assert call_llm_routed("p", SCHEMA) == _answer()
+    assert [(c["tier"], c["fields"]) for c in calls] == [("small", FIELDS), ("large", ["a", "b", "c"])]
+
+
+def test_valid_small_answer_is_not_escalated(stub):
+    answers, calls = stub
+    answers.update(small=_answer())
+
+    assert call_llm_routed("p", SCHEMA) == _answer()
+    assert [c["tier"] for c in calls] == ["small"]
+
+
+def test_compile_schema_reports_missing_and_invalid_fields():
+    validate = llm_client.compile_schema(SCHEMA)
+    assert validate(_answer()) == []
+    assert validate({**_answer(a="one"), "b": 2}) == ["a", "b"]
+    assert validate({k: v for k, v in _answer().items() if k != "h"}) == ["h"]
+    assert validate("not an object") == FIELDS
+
+
+def test_sub_schemas_get_their_own_validators():
+    only_a = llm_client.compile_schema(llm_client.sub_schema(SCHEMA, ["a"]))
+    only_b = llm_client.compile_schema(llm_client.sub_schema(SCHEMA, ["b"]))
+    assert only_a({"a": "one"}) == ["a"]
+    assert only_b({"b": 2}) == ["b"]
+    assert only_b({"a": "one", "b": "B"}) == []
+
+
+def test_single_follow_up_quotes_the_rejected_value(stub):
+    answers, calls = stub
+    answers.update(small=_answer(a="one"), large={"a": "still one"}, followup={"a": "never fixed"})
+
+    assert call_llm_routed("p", SCHEMA) == {k: v for k, v in _answer().items() if k != "a"}
+    assert [(c["tier"], c["fields"]) for c in calls] == [("small", FIELDS), ("large", ["a"]), ("followup", ["a"])]
+    large, followup = calls[1]["prompt"], calls[2]["prompt"]
+    assert followup != large
+    assert '"still one"' in followup and '"integer"' in followup
+
+
+def test_only_valid_structured_answers_are_cached(tmp_path, monkeypatch):
+    previous = llm_client.configure(cache_dir=str(tmp_path), stats_path=None, dry_run=False)
+    monkeypatch.setenv("DATABRICKS_HOST", "https://example")
+    monkeypatch.setenv("DATABRICKS_TOKEN", "t")
+    replies = iter([_answer(a="one"), _answer(a="one again"), _answer(), _answer(a="not served")])
+
+    class Response:
+        status_code = 200
+
+        def __init__(self, content):
+            self.content = json.dumps(content)
+
+        def json(self):
+            return {"choices": [{"message": {"tool_calls": [{"function": {"arguments": self.content}}]}}]}
+
+    monkeypatch.setattr(llm_client.requests, "post", lambda *a, **k: Response(next(replies)))
+    try:
+        assert json.loads(llm_client.call_llm("p", schema=SCHEMA))["a"] == "one"
+        assert json.loads(llm_client.call_llm("p", schema=SCHEMA))["a"] == "one again"   # not cached
+        assert json.loads(llm_client.call_llm("p", schema=SCHEMA))["a"] == 1
+        assert json.loads(llm_client.call_llm("p", schema=SCHEMA))["a"] == 1             # from the cache
+    finally:
+        llm_client.configure(**previous)
@@ -0,0 +1,91 @@
+import pandas as pd
+import pytest
+
+import orchestrator
+from dead_letter import DeadLetterStore
+
+CANONICAL = {"id": 1.0, "name": "A"}
+TRANSLATED = {"id": 1.0, "name": "A", "contact_info": "{}", "medical_details": "{}", "client_capability": None,
+              "reliability": "Low", "reliability_reasons": '["Auto-assigned Low"]', "stats": "{}", "created_at": "old"}
+
+
+def _agent3(canonical, translated):
+    return {"translated": {**translated, "contact_info": '{"email": "a@b.org"}', "client_capability": "new"},
+            "degraded": None}
+
+
+def _agent4(canonical, translated):
+    return {"translated": {**translated, "reliability": "High", "stats": '{"score": 90}', "created_at": "new"},
+            "degraded": None}
+
+
+def _raise(canonical, translated):
+    raise RuntimeError("still down")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DeadLetterStore(str(tmp_path / "dead_letter.jsonl"))
+
+
+def _output():
+    return pd.DataFrame([dict(TRANSLATED), {**TRANSLATED, "id": 2.0, "name": "B"}])
+
+
+def _record(store, stage, degraded, pending=()):
+    store.record("1.0", stage, {"canonical": CANONICAL, "translated": dict(TRANSLATED)},
+                 "IncompleteOutput" if degraded else "Exception", "boom", degraded=degraded, pending=pending)
+
+
+def test_degraded_entry_merges_only_its_stage_and_resolves(store, monkeypatch):
+    monkeypatch.setattr(orchestrator, "process_agent3", _agent3)
+    _record(store, "agent_3", degraded=True)
+
+    out = orchestrator.replay_dead_letters(_output(), store).set_index("id")
+    assert out.loc[1.0, "client_capability"] == "new"
+    assert out.loc[1.0, "reliability"] == "Low"                # agent_4 fields untouched
+    assert pd.isna(out.loc[2.0, "client_capability"])
+    assert store.entries() == []
+
+
+def test_degraded_again_keeps_output_and_entry(store, monkeypatch):
+    monkeypatch.setattr(orchestrator, "process_agent3",
+                        lambda c, t: {"translated": t, "degraded": {"error_class": "IncompleteOutput", "error": "x"}})
+    _record(store, "agent_3", degraded=True)
+
+    out = orchestrator.replay_dead_letters(_output(), store)
+    pd.testing.assert_frame_equal(out, _output())
+    assert [(e["stage"], e["degraded"]) for e in store.entries()] == [("agent_3", True)]
+
+
+def test_failed_entry_reruns_pending_stages(store, monkeypatch):
+    monkeypatch.setattr(orchestrator, "process_agent3", _agent3)
+    monkeypatch.setattr(orchestrator, "process_agent4", _agent4)
+    _record(store, "agent_3", degraded=False, pending=("agent_4",))
+
+    out = orchestrator.replay_dead_letters(_output(), store).set_index("id")
+    assert out.loc[1.0, "client_capability"] == "new"
+    assert out.loc[1.0, "reliability"] == "High"
+    assert out.loc[1.0, "created_at"] == "new"
+    assert store.entries() == []
+
+
+def test_failed_pending_stage_is_not_merged(store, monkeypatch):
+    monkeypatch.setattr(orchestrator, "process_agent3", _agent3)
+    monkeypatch.setattr(orchestrator, "process_agent4", _raise)
+    _record(store, "agent_3", degraded=False, pending=("agent_4",))
+
+    out = orchestrator.replay_dead_letters(_output(), store).set_index("id")
+    assert out.loc[1.0, "client_capability"] == "new"
+    assert out.loc[1.0, "reliability"] == "Low"
+    assert out.loc[1.0, "created_at"] == "old"
+    assert [(e["stage"], e["error_class"]) for e in store.entries()] == [("agent_4", "RuntimeError")]
+
+
+def test_clean_rerun_resolves_open_entries(store, monkeypatch):
+    monkeypatch.setattr(orchestrator, "process_agent4", _agent4)
+    _record(store, "agent_4", degraded=True)
+
+    state = {"canonical": dict(CANONICAL), "translated": dict(TRANSLATED)}
+    orchestrator.process_single_row(None, dead_letter=store, state=state, stages=("agent_4",))
+    assert store.entries() == []
@@ -0,0 +1,41 @@
+import os
+
+import pandas as pd
+
+import cli
+
+CLEAN_VIRT = os.path.join(os.path.dirname(__file__), "..", "..", "clean_virt.csv")
+
+
+def _args(tmp_path, mode="resume"):
+    return cli.build_parser().parse_args(["--input", CLEAN_VIRT, "--output", str(tmp_path / "out.parquet"),
+                                          "--mode", mode])
+
+
+def _existing():
+    # A full run folded General Clinic (274.0) into Danpong HealthCare (184.0)
+    return pd.DataFrame([
+        {"id": 184.0, "name": "Danpong HealthCare", "duplicate_ids": ["274.0"]},
+        {"id": 1.0, "name": "A", "duplicate_ids": []},
+    ])
+
+
+def test_resume_skips_folded_duplicates(tmp_path):
+    df = cli._load_input(_args(tmp_path), _existing())
+    remaining = set(df["pk_unique_id"].astype(str))
+    assert "184.0" not in remaining
+    assert "274.0" not in remaining
+    assert "1.0" not in remaining
+
+
+def test_merge_drops_rows_already_folded():
+    result = pd.DataFrame([{"id": 274.0, "name": "General Clinic", "duplicate_ids": []},
+                           {"id": 5.0, "name": "E", "duplicate_ids": []}])
+    merged = cli._merge_by_id(_existing(), result)
+    assert sorted(merged["id"].astype(str)) == ["1.0", "184.0", "5.0"]
+
+
+def test_merge_drops_existing_rows_the_new_run_folds():
+    result = pd.DataFrame([{"id": 5.0, "name": "E", "duplicate_ids": ["1.0"]}])
+    merged = cli._merge_by_id(_existing(), result)
+    assert sorted(merged["id"].astype(str)) == ["184.0", "5.0"]
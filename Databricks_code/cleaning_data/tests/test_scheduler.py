@@ -0,0 +1,63 @@
+import json
+
+import pandas as pd
+import pytest
+
+from scheduler import city_regions, order_rows, region_of
+
+
+def _rows():
+    return pd.DataFrame([
+        {"pk_unique_id": 1.0, "address_city": "Accra", "address_stateOrRegion": "Greater Accra Region",
+         "capability": json.dumps(["a"]), "procedure": None},
+        {"pk_unique_id": 2.0, "address_city": "Accra", "address_stateOrRegion": None,
+         "capability": json.dumps(["a", "b", "c"]), "procedure": None},
+        {"pk_unique_id": 3.0, "address_city": "Kumasi", "address_stateOrRegion": "Ashanti",
+         "capability": None, "procedure": None},
+        {"pk_unique_id": 4.0, "address_city": "Osu", "address_stateOrRegion": "Accra",
+         "capability": json.dumps(["a", "b"]), "procedure": None},
+        {"pk_unique_id": 5.0, "address_city": "Tamale", "address_stateOrRegion": None,
+         "capability": None, "procedure": None},
+    ])
+
+
+def _order(df, **kw):
+    return order_rows(df, **kw)["pk_unique_id"].tolist()
+
+
+def test_city_regions_map_cities_to_their_majority_region():
+    cities = city_regions(_rows().to_dict(orient="records"))
+    assert cities == {"accra": "greater accra", "kumasi": "ashanti", "osu": "greater accra"}
+    records = _rows().to_dict(orient="records")
+    assert [region_of(r, cities) for r in records] == \
+        ["greater accra", "greater accra", "ashanti", "greater accra", "unknown"]
+
+
+def test_order_rows_round_robins_regions_then_richness():
+    # First pass: the richest row of each region, then the rest of greater accra by richness
+    assert _order(_rows(), priority=("region", "richness")) == [2.0, 3.0, 5.0, 4.0, 1.0]
+    assert _order(_rows(), priority=("richness",)) == [2.0, 4.0, 1.0, 3.0, 5.0]
+    assert _order(_rows(), priority=()) == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_order_rows_puts_covered_regions_last():
+    existing = pd.DataFrame([
+        {"id": 10.0, "created_at": "2025-01-01", "location_info": json.dumps({"address_city": "Accra"})},
+        {"id": 11.0, "created_at": "2025-01-01",
+         "location_info": json.dumps({"address_city": "Kumasi", "address_stateOrRegion": "Ashanti Region"})},
+    ])
+    # Enriched cities use the same city -> region map as the input rows
+    assert _order(_rows(), priority=("region", "richness"), existing=existing) == [5.0, 2.0, 3.0, 4.0, 1.0]
+
+
+def test_order_rows_stale_puts_never_enriched_rows_first():
+    existing = pd.DataFrame([
+        {"id": 1.0, "created_at": "2025-03-01"},
+        {"id": 2.0, "created_at": "2025-01-01"},
+    ])
+    assert _order(_rows(), priority=("stale",), existing=existing) == [3.0, 4.0, 5.0, 2.0, 1.0]
+
+
+def test_order_rows_rejects_unknown_priorities():
+    with pytest.raises(ValueError):
+        order_rows(_rows(), priority=("size",))